@@ -45,5 +45,9 @@ setup(
     py_modules=['zabbix_api'],
     platforms='any',
     classifiers=CLASSIFIERS,
-    include_package_data=True
+    include_package_data=True,
+    extras_require={
+        'fast': ['orjson'],
+        'pool': ['urllib3'],
+    }
 )
@@ -31,18 +31,60 @@ NOTES: The API requires Zabbix 1.8 or later.
 from logging import getLogger, DEBUG, INFO, WARNING, ERROR
 from collections import deque
 from datetime import datetime
+from functools import partial
 from hashlib import md5
 from base64 import b64encode
-from time import time
+from time import time, mktime
+
+try:
+    from time import monotonic
+except ImportError:
+    monotonic = time  # python 2
 from packaging import version
+from math import floor
 import re
 import ssl
+import warnings
+
+try:
+    # noinspection PyPackageRequirements
+    import orjson
+except ImportError:
+    orjson = None
+
+    try:
+        # noinspection PyPackageRequirements
+        import ujson as json
+    except ImportError:
+        try:
+            # noinspection PyPackageRequirements
+            import simplejson as json
+        except ImportError:
+            import json
+
+if orjson is None:
+    json_dumps = json.dumps
+
+    def json_dumps_bytes(obj):
+        return json.dumps(obj).encode('utf-8')
+
+    def json_loads(data):
+        return json.loads(data.decode('utf-8'))
+else:
+    json_loads = orjson.loads  # orjson accepts bytes directly
+
+    def json_dumps_bytes(obj):
+        # Non-str dict keys are converted to strings as in the json module
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)  # orjson produces bytes directly
+
+    def json_dumps(obj):
+        return json_dumps_bytes(obj).decode('utf-8')
 
 try:
     # noinspection PyPackageRequirements
-    import simplejson as json
+    import urllib3
 except ImportError:
-    import json
+    urllib3 = None
 
 try:
     import urllib2
@@ -51,7 +93,7 @@ except ImportError:
     import urllib.request as urllib2  # python3
 
 __all__ = ('ZabbixAPI', 'ZabbixAPIException', 'ZabbixAPIError')
-__version__ = '1.2.4'
+__version__ = '1.3.0'
 
 PARENT_LOGGER = __name__
 DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
@@ -63,18 +105,25 @@ TRIGGER_SEVERITY = (
     'high',
     'disaster',
 )
-RE_HIDE_AUTH = (
-    (re.compile(r'("auth": )".*?"'), r'\1"***"'),
-    (re.compile(r'("password": )".*?"'), r'\1"***"'),
-)
+RE_HIDE_AUTH = re.compile(r'("(?:auth|password)": ?)".*?"')
+
+
+def md5_hexdigest(data):
+    """Return MD5 hex digest of a string (not used for security purposes)."""
+    data = data.encode('utf-8')
+
+    try:
+        return md5(data, usedforsecurity=False).hexdigest()  # python >= 3.9
+    except TypeError:
+        return md5(data).hexdigest()
 
 
 def hide_auth(msg):
     """Remove sensitive information from msg."""
-    for pattern, repl in RE_HIDE_AUTH:
-        msg = pattern.sub(repl, msg)
+    if '"auth"' not in msg and '"password"' not in msg:  # fast path - nothing to hide
+        return msg
 
-    return msg
+    return RE_HIDE_AUTH.sub(r'\1"***"', msg)
 
 
 class ZabbixAPIException(Exception):
@@ -108,12 +157,17 @@ class ZabbixAPI(object):
     """
     __username = None
     __password = None
+    __password_md5 = None
     __auth = None
+    _auth_json = 'null'  # JSON-encoded __auth cached for _json_body() (not used with orjson)
     _http_handler = None
+    _http_opener = None
+    _pool = None
     _http_headers = None
     _api_url = None
     id = 0
     last_login = None
+    _last_login_monotonic = None  # used for relogin_interval checks
 
     QUERY_EXTEND = 'extend'
     QUERY_COUNT = 'count'
@@ -137,7 +191,7 @@ class ZabbixAPI(object):
         :param str passwd: Optional HTTP auth password
         :param int log_level: Logging level
         :param int timeout: Timeout for HTTP requests to api (in seconds)
-        :param int r_query_len: Max length of query history
+        :param int r_query_len: Max length of query history (see recent_query())
         :param bool ssl_verify: Whether to perform HTTPS certificate verification (only for python >= 2.7.9)
         :param int relogin_interval: Minimum time (in seconds) after which an automatic re-login is performed; \
          Can be set to None to disable automatic re-logins
@@ -167,11 +221,47 @@ class ZabbixAPI(object):
         return api_method
 
     def init(self):
-        """Prepare the HTTP handler, URL, and HTTP headers for all subsequent requests"""
+        """Prepare the HTTP connection pool (or handler), URL, and HTTP headers for all subsequent requests"""
         self.debug('Initializing %r', self)
         proto = self.server.split('://')[0]
 
-        if proto == 'https':
+        if proto not in ('http', 'https'):
+            raise ValueError('Invalid protocol %s' % proto)
+
+        self._api_url = self.server + '/api_jsonrpc.php'
+        self._http_headers = {
+            'Content-Type': 'application/json-rpc',
+            'User-Agent': 'python/zabbix_api',
+        }
+
+        if self.httpuser:
+            self.debug('HTTP authentication enabled')
+            auth = self.httpuser + ':' + self.httppasswd
+            self._http_headers['Authorization'] = 'Basic ' + b64encode(auth.encode('utf-8')).decode('ascii')
+
+        if urllib3 is not None:
+            # Persistent connections (HTTP keep-alive) are reused across API calls.
+            # Failed requests are not retried (same as with urllib2).
+            pool_kwargs = {
+                'num_pools': 1,
+                'maxsize': 4,
+                'retries': False,
+                'headers': self._http_headers,
+                'cert_reqs': 'CERT_REQUIRED' if self.ssl_verify else 'CERT_NONE',
+            }
+            proxy = self._get_proxy(proto)
+
+            if proxy:
+                self.debug('Using HTTP proxy %s', proxy)
+                proxy_auth = urllib3.util.parse_url(proxy).auth
+
+                if proxy_auth:
+                    pool_kwargs['proxy_headers'] = urllib3.make_headers(proxy_basic_auth=proxy_auth)
+
+                self._pool = urllib3.ProxyManager(proxy, **pool_kwargs)
+            else:
+                self._pool = urllib3.PoolManager(**pool_kwargs)
+        elif proto == 'https':
             if hasattr(ssl, 'create_default_context'):
                 context = ssl.create_default_context()
 
@@ -185,29 +275,33 @@ class ZabbixAPI(object):
                 self._http_handler = urllib2.HTTPSHandler(debuglevel=0, context=context)
             else:
                 self._http_handler = urllib2.HTTPSHandler(debuglevel=0)
-        elif proto == 'http':
-            self._http_handler = urllib2.HTTPHandler(debuglevel=0)
         else:
-            raise ValueError('Invalid protocol %s' % proto)
+            self._http_handler = urllib2.HTTPHandler(debuglevel=0)
 
-        self._api_url = self.server + '/api_jsonrpc.php'
-        self._http_headers = {
-            'Content-Type': 'application/json-rpc',
-            'User-Agent': 'python/zabbix_api',
-        }
+        if self._http_handler:
+            self._http_opener = urllib2.build_opener(self._http_handler)
 
-        if self.httpuser:
-            self.debug('HTTP authentication enabled')
-            auth = self.httpuser + ':' + self.httppasswd
-            self._http_headers['Authorization'] = 'Basic ' + b64encode(auth.encode('utf-8')).decode('ascii')
+    def _get_proxy(self, proto):
+        """Return proxy URL from environment (http_proxy, https_proxy, no_proxy) for the server or None"""
+        proxy = urllib2.getproxies().get(proto)
+
+        if not proxy or urllib2.proxy_bypass(self.server.split('://', 1)[1].split('/', 1)[0]):
+            return None
+
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+
+        return proxy
 
     @staticmethod
     def get_severity(prio):
         """Return severity string from severity id"""
-        try:
-            return TRIGGER_SEVERITY[int(prio)]
-        except IndexError:
-            return 'unknown'
+        prio = int(prio)
+
+        if 0 <= prio < len(TRIGGER_SEVERITY):
+            return TRIGGER_SEVERITY[prio]
+
+        return 'unknown'
 
     @classmethod
     def get_datetime(cls, timestamp):
@@ -226,10 +320,15 @@ class ZabbixAPI(object):
 
     @staticmethod
     def get_age(dt):
-        """Calculate delta between current time and datetime and return a human readable form of the delta object"""
-        delta = datetime.now() - dt
-        days = delta.days
-        hours, rem = divmod(delta.seconds, 3600)
+        """Calculate delta between current time and datetime or unix timestamp and return it in a human readable form"""
+        if isinstance(dt, datetime):
+            try:
+                dt = dt.timestamp()  # handles timezone-aware datetimes
+            except AttributeError:
+                dt = mktime(dt.timetuple())  # python 2
+
+        days, rem = divmod(int(floor(time() - float(dt))), 86400)
+        hours, rem = divmod(rem, 3600)
         minutes, seconds = divmod(rem, 60)
 
         if days:
@@ -238,7 +337,7 @@ class ZabbixAPI(object):
             return '%dh %dm %ds' % (hours, minutes, seconds)
 
     def recent_query(self):
-        """Return recent API query object"""
+        """Return list of recent API queries as (timestamp, method, id) tuples"""
         return list(self.r_query)
 
     def set_log_level(self, level):
@@ -253,54 +352,79 @@ class ZabbixAPI(object):
 
     def json_obj(self, method, params=None, auth=True):
         """Return JSON object expected by the Zabbix API"""
+        return self._json_body(method, params=params, auth=auth).decode('utf-8')
+
+    def _json_body(self, method, params=None, auth=True):
+        """Return encoded JSON object expected by the Zabbix API (request body)"""
         if params is None:
             params = {}
 
-        obj = {
-            'jsonrpc': '2.0',
-            'method': method,
-            'params': params,
-            'auth': self.__auth if auth else None,
-            'id': self.id,
-        }
-
-        return json.dumps(obj)
-
-    def do_request(self, json_obj):
-        """Perform one HTTP request to Zabbix API"""
-        self.debug('Request: url="%s" headers=%s', self._api_url, self._http_headers)
-        self.debug('Request: body=%s', json_obj)
-        self.r_query.append(json_obj)
+        if orjson is not None:  # encoding the whole object at once is the fastest way with orjson
+            return json_dumps_bytes({
+                'jsonrpc': '2.0',
+                'method': method,
+                'params': params,
+                'auth': self.__auth if auth else None,
+                'id': self.id,
+            })
+
+        # Only method and params need to be encoded for every request
+        return ('{"jsonrpc":"2.0","method":%s,"params":%s,"auth":%s,"id":%d}' % (
+            json_dumps(method), json_dumps(params), self._auth_json if auth else 'null', self.id
+        )).encode('utf-8')
+
+    def _http_request(self, json_obj):
+        """Send one HTTP request to Zabbix API and return the decoded JSON response"""
+        if isinstance(json_obj, bytes):
+            data = json_obj
+        else:
+            data = json_obj.encode('utf-8')
 
-        request = urllib2.Request(url=self._api_url, data=json_obj.encode('utf-8'), headers=self._http_headers)
-        opener = urllib2.build_opener(self._http_handler)
-        urllib2.install_opener(opener)
+        if self.logger.isEnabledFor(DEBUG):
+            self.debug('Request: url="%s" headers=%s', self._api_url, self._http_headers)
+            self.debug('Request: body=%s', data.decode('utf-8'))
 
         try:
-            response = opener.open(request, timeout=self.timeout)
+            if self._pool is None:
+                request = urllib2.Request(url=self._api_url, data=data, headers=self._http_headers)
+                response = self._http_opener.open(request, timeout=self.timeout)
+                status, reads = response.code, response.read()
+            else:
+                if self.ssl_verify:
+                    response = self._pool.request('POST', self._api_url, body=data, timeout=self.timeout)
+                else:
+                    with warnings.catch_warnings():  # unverified HTTPS requests were requested explicitly
+                        warnings.simplefilter('ignore', urllib3.exceptions.InsecureRequestWarning)
+                        response = self._pool.request('POST', self._api_url, body=data, timeout=self.timeout)
+
+                status, reads = response.status, response.data
         except Exception as e:
             raise ZabbixAPIException('HTTP connection problem: %s' % e)
 
-        self.debug('Response: code=%s', response.code)
+        if self.logger.isEnabledFor(DEBUG):
+            self.debug('Response: code=%s', status)
 
         # NOTE: Getting a 412 response code means the headers are not in the list of allowed headers.
-        if response.code != 200:
-            raise ZabbixAPIException('HTTP error %s: %s' % (response.status, response.reason))
-
-        reads = response.read()
+        if status != 200:
+            raise ZabbixAPIException('HTTP error %s: %s' % (status, response.reason))
 
         if len(reads) == 0:
             raise ZabbixAPIException('Received zero answer')
 
         try:
-            jobj = json.loads(reads.decode('utf-8'))
+            jobj = json_loads(reads)
         except ValueError as e:
             self.log(ERROR, 'Unable to decode. returned string: %s', reads)
             raise ZabbixAPIException('Unable to decode response: %s' % e)
 
-        self.debug('Response: body=%s', jobj)
-        self.id += 1
+        if self.logger.isEnabledFor(DEBUG):
+            self.debug('Response: body=%s', jobj)
+
+        return jobj
 
+    @staticmethod
+    def _get_result(jobj):
+        """Return result from one JSON-RPC response object or raise an exception"""
         if 'error' in jobj:  # zabbix API error
             error = jobj['error']
 
@@ -312,38 +436,102 @@ class ZabbixAPI(object):
         except KeyError:
             raise ZabbixAPIException('Missing result in API response')
 
+    def do_request(self, json_obj, method=None):
+        """Perform one HTTP request to Zabbix API"""
+        self.r_query.append((time(), method, self.id))
+        jobj = self._http_request(json_obj)
+        self.id += 1
+
+        return self._get_result(jobj)
+
+    def do_batch_request(self, calls):
+        """Perform multiple Zabbix API requests in one HTTP request (JSON-RPC batch)"""
+        first_id = self.id
+        batch = [{
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': {} if params is None else params,
+            'auth': self.__auth,
+            'id': first_id + i,
+        } for i, (method, params) in enumerate(calls)]
+        now = time()
+        self.r_query.extend((now, req['method'], req['id']) for req in batch)
+        jobj = self._http_request(json_dumps_bytes(batch))
+        self.id += len(batch)
+
+        if not isinstance(jobj, list):  # the whole batch was rejected
+            self._get_result(jobj)
+            raise ZabbixAPIException('Invalid batch response from API')
+
+        responses = {}
+
+        for res in jobj:
+            if isinstance(res, dict) and 'id' in res:
+                responses[res['id']] = res
+
+        results = []
+        error = None
+
+        for i in range(len(batch)):
+            try:
+                results.append(self._get_result(responses[first_id + i]))
+            except KeyError:
+                results.append(ZabbixAPIException('Missing response in API batch response'))
+            except ZabbixAPIException as ex:
+                results.append(ex)
+            else:
+                continue
+
+            if error is None:
+                error = results[-1]
+
+        if error is not None:
+            error.results = results  # results or exceptions of all requests in the batch
+            raise error
+
+        return results
+
     def login(self, user=None, password=None, save=True):
         """Perform a user.login API request"""
         if user and password:
+            password_md5 = md5_hexdigest(password)
+
             if save:
                 self.__username = user
                 self.__password = password
+                self.__password_md5 = password_md5
         elif self.__username and self.__password:
             user = self.__username
             password = self.__password
+            password_md5 = self.__password_md5
         else:
             raise ZabbixAPIException('No authentication information available.')
 
         self.last_login = time()
+        self._last_login_monotonic = monotonic()
         # Don't print the raw password
-        hashed_pw_string = 'md5(%s)' % md5(password.encode('utf-8')).hexdigest()
-        self.debug('Trying to login with %r:%r', user, hashed_pw_string)
+        self.debug('Trying to login with %r:%r', user, 'md5(%s)' % password_md5)
         if version.parse(self.api_version()) >= version.parse('5.4'):
-            obj = self.json_obj('user.login', params={'username': user, 'password': password}, auth=False)
+            obj = self._json_body('user.login', params={'username': user, 'password': password}, auth=False)
         else:
-            obj = self.json_obj('user.login', params={'user': user, 'password': password}, auth=False)
-        self.__auth = self.do_request(obj)
+            obj = self._json_body('user.login', params={'user': user, 'password': password}, auth=False)
+        self._set_auth(self.do_request(obj, method='user.login'))
 
     def relogin(self):
         """Perform a re-login"""
         try:
-            self.__auth = None  # reset auth before relogin
+            self._set_auth(None)  # reset auth before relogin
             self.login()
         except ZabbixAPIException as e:
             self.log(ERROR, 'Zabbix API relogin error (%s)', e)
-            self.__auth = None  # logged_in() will always return False
+            self._set_auth(None)  # logged_in() will always return False
             raise  # Re-raise the exception
 
+    def _set_auth(self, auth):
+        """Save the auth token together with its JSON representation"""
+        self.__auth = auth
+        self._auth_json = json_dumps(auth)
+
     @property
     def logged_in(self):
         return bool(self.__auth)
@@ -351,35 +539,68 @@ class ZabbixAPI(object):
     def check_auth(self):
         """Perform a re-login if not signed in or raise an exception"""
         if not self.logged_in:
-            if self.relogin_interval and self.last_login and (time() - self.last_login) > self.relogin_interval:
+            if (self.relogin_interval and self._last_login_monotonic and
+                    (monotonic() - self._last_login_monotonic) > self.relogin_interval):
                 self.log(WARNING, 'Zabbix API not logged in. Performing Zabbix API relogin after %d seconds',
                          self.relogin_interval)
                 self.relogin()  # Will raise exception in case of login error
             else:
                 raise ZabbixAPIException('Not logged in.')
 
+    def _is_login_error(self, ex):
+        """Return True if automatic re-login is enabled and the ZabbixAPIError is caused by an expired session"""
+        return bool(self.relogin_interval) and any(i in ex.error['data'] for i in self.LOGIN_ERRORS)
+
     def api_version(self):
         """Call apiinfo.version API method"""
-        return self.do_request(self.json_obj('apiinfo.version', auth=False))
+        return self.do_request(self._json_body('apiinfo.version', auth=False), method='apiinfo.version')
 
     def call(self, method, params=None):
         """Check authentication and perform actual API request and relogin if needed"""
-        start_time = time()
+        start_time, start = time(), monotonic()
         self.check_auth()
         self.log(INFO, '[%s-%05d] Calling Zabbix API method "%s"', start_time, self.id, method)
-        self.log(DEBUG, '\twith parameters: %s', params)
+
+        if self.logger.isEnabledFor(DEBUG):
+            self.log(DEBUG, '\twith parameters: %s', params)
 
         try:
-            return self.do_request(self.json_obj(method, params=params))
+            return self.do_request(self._json_body(method, params=params), method=method)
         except ZabbixAPIError as ex:
-            if self.relogin_interval and any(i in ex.error['data'] for i in self.LOGIN_ERRORS):
+            if self._is_login_error(ex):
                 self.log(WARNING, 'Zabbix API not logged in (%s). Performing Zabbix API relogin', ex)
                 self.relogin()  # Will raise exception in case of login error
-                return self.do_request(self.json_obj(method, params=params))
+                return self.do_request(self._json_body(method, params=params), method=method)
             raise  # Re-raise the exception
         finally:
             self.log(INFO, '[%s-%05d] Zabbix API method "%s" finished in %g seconds',
-                     start_time, self.id, method, (time() - start_time))
+                     start_time, self.id, method, (monotonic() - start))
+
+    def call_many(self, calls):
+        """Perform (method, params) API requests in one HTTP request; on error, exception.results has all results"""
+        calls = list(calls)
+
+        if not calls:
+            return []
+
+        methods = ', '.join(method for method, _ in calls)
+        start_time, start = time(), monotonic()
+        self.check_auth()
+        self.log(INFO, '[%s-%05d] Calling Zabbix API methods "%s"', start_time, self.id, methods)
+
+        try:
+            return self.do_batch_request(calls)
+        except ZabbixAPIError as ex:
+            # Re-send the batch only if no request in it was performed, i.e. all of them failed due to login errors
+            if all(isinstance(res, ZabbixAPIError) and self._is_login_error(res)
+                   for res in getattr(ex, 'results', None) or [ex]):
+                self.log(WARNING, 'Zabbix API not logged in (%s). Performing Zabbix API relogin', ex)
+                self.relogin()  # Will raise exception in case of login error
+                return self.do_batch_request(calls)
+            raise  # Re-raise the exception
+        finally:
+            self.log(INFO, '[%s-%05d] Zabbix API methods "%s" finished in %g seconds',
+                     start_time, self.id, methods, (monotonic() - start))
 
 
 class ZabbixAPISubClass(object):
@@ -394,13 +615,20 @@ class ZabbixAPISubClass(object):
     def __repr__(self):
         return '%s(%s)' % (self.__class__.__name__, self.prefix)
 
+    def call_many(self, calls):
+        """Perform a list of (method, params) API requests of this API object in one HTTP request [see call_many()]"""
+        return self.parent.call_many([('%s.%s' % (self.prefix, method), params) for method, params in calls])
+
     def __getattr__(self, name):
         if name.startswith('_'):
             raise AttributeError("%r object has no attribute %r" % (self.__class__, name))
 
         if self.prefix == 'configuration' and name == 'import_':  # workaround for "import" method
-            name = 'import'
+            method_name = 'configuration.import'
+        else:
+            method_name = '%s.%s' % (self.prefix, name)
+
+        method = partial(self.parent.call, method_name)
+        setattr(self, name, method)
 
-        def method(params=None):
-            return self.parent.call('%s.%s' % (self.prefix, name), params=params)
         return method